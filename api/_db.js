@@ -8,8 +8,17 @@ const connectionString = process.env.DATABASE_URL
 const pool = global.__pgPool ?? new Pool({
   connectionString,
   ssl: { rejectUnauthorized: false }, // Neon pooler requiere SSL
+  max: 8,                             // conexiones TLS reutilizables por instancia
+  idleTimeoutMillis: 30000,
+  keepAlive: true,                    // mantiene vivo el socket entre invocaciones calientes
+  keepAliveInitialDelayMillis: 10000, // bien por debajo de idleTimeoutMillis
 });
-if (!global.__pgPool) global.__pgPool = pool;
+if (!global.__pgPool) {
+  // Neon puede cerrar conexiones ociosas: el pool descarta el cliente caído y
+  // la siguiente petición abre uno nuevo, en lugar de tumbar el proceso.
+  pool.on('error', (err) => console.warn('PG_POOL_IDLE_CLIENT_ERROR', err.message));
+  global.__pgPool = pool;
+}
 
 export async function withClient(fn) {
   const client = await pool.connect();
@@ -12,15 +12,53 @@ export function sanitize(name) {
     .replace(/^_+|_+$/g, '');
 }
 
-export function sniffDelimiter(sampleText) {
-  const head = sampleText.split(/\r?\n/).slice(0, 5).join('\n');
-  const commas = (head.match(/,/g) || []).length;
-  const semis  = (head.match(/;/g) || []).length;
-  return semis > commas ? ';' : ',';
+// Solo la cabecera y las primeras filas importan para inferir el delimitador
+const SNIFF_SAMPLE_SIZE = 65536; // bytes si la entrada es Buffer, caracteres si es string
+const SNIFF_SAMPLE_LINES = 5;
+// En orden de preferencia ante empate
+const DELIMITER_CANDIDATES = [',', ';', '\t', '|'];
+
+function countOutsideQuotes(line, delimiter) {
+  let count = 0;
+  let quoted = false;
+  for (let i = 0; i < line.length; i++) {
+    const ch = line[i];
+    if (ch === '"') quoted = !quoted;
+    else if (ch === delimiter && !quoted) count++;
+  }
+  return count;
+}
+
+// Acepta string o Buffer; de un Buffer solo se decodifica la muestra
+export function sniffDelimiter(input) {
+  const sample = typeof input === 'string'
+    ? input.slice(0, SNIFF_SAMPLE_SIZE)
+    : input.subarray(0, SNIFF_SAMPLE_SIZE).toString('utf8');
+  const lines = sample
+    .split(/\r?\n/, SNIFF_SAMPLE_LINES)
+    .filter(line => line !== '');
+  if (!lines.length) return ',';
+
+  // Puntaje: ocurrencias en la cabecera, premiando que se repitan igual en las filas
+  let best = ',';
+  let bestScore = 0;
+  for (const delimiter of DELIMITER_CANDIDATES) {
+    const counts = lines.map(line => countOutsideQuotes(line, delimiter));
+    const headerCount = counts[0];
+    if (headerCount === 0) continue;
+    const consistent = counts.filter(c => c === headerCount).length;
+    const score = headerCount * consistent;
+    if (score > bestScore) {
+      best = delimiter;
+      bestScore = score;
+    }
+  }
+  return best;
 }
 
+// Celdas vacías o ausentes (filas más cortas que la cabecera) -> NULL, sin rellenar la fila
 export function toDb(v) {
-  if (v === '') return null;
+  if (v === '' || v === undefined) return null;
   return v;
 }
 
@@ -30,6 +68,10 @@ const MONTH_MAP = {
   sep: '09', oct: '10', nov: '11', dic: '12',
 };
 
+// Se evalúan por cada celda de fecha: compiladas una sola vez a nivel de módulo
+const ISO_DATE_RE = /^\d{4}-\d{2}-\d{2}/;
+const JIRA_DATE_RE = /^(\d{1,2})\/([a-z]{3})\/(\d{2,4})\s+(\d{1,2}):(\d{2})\s*(AM|PM)$/i;
+
 export function normalizeJiraDate(value) {
   if (value == null || value === '') return null;
   if (typeof value !== 'string') return null;
@@ -38,15 +80,13 @@ export function normalizeJiraDate(value) {
   if (trimmed === '') return null;
 
   // Si ya está en formato ISO (YYYY-MM-DD...) devolver tal cual
-  if (/^\d{4}-\d{2}-\d{2}/.test(trimmed)) {
+  if (ISO_DATE_RE.test(trimmed)) {
     return trimmed;
   }
 
   // Formato Jira español: dd/mmm/yy HH:MM AM/PM
   // Ejemplos: "30/abr/26 12:17 PM", "02/may/26 08:45 AM"
-  const match = trimmed.match(
-    /^(\d{1,2})\/([a-z]{3})\/(\d{2,4})\s+(\d{1,2}):(\d{2})\s*(AM|PM)$/i
-  );
+  const match = JIRA_DATE_RE.exec(trimmed);
 
   if (match) {
     const day = match[1].padStart(2, '0');
@@ -87,6 +127,9 @@ const TIMESTAMP_COLUMNS = new Set([
   'fecha_pase_a_produccion',
 ]);
 
+// Filas por sentencia de carga masiva (un solo parámetro JSON por lote)
+const BULK_BATCH_ROWS = 5000;
+
 export function quoteIdent(identifier) {
   return `"${identifier.replace(/"/g, '""')}"`;
 }
@@ -248,182 +291,188 @@ function missingImportantColumns(uniqueHeaders, tableCols, mapping) {
   const csvBases = new Set(uniqueHeaders.map(h => h.base));
   const mappedTargets = new Set(mapping.map(m => m.targetDbCol));
 
-  return IMPORTANT_COLUMNS
-    .filter((important) => {
-      const existsInCsv = important.csvCandidates.some(c => csvBases.has(c));
-      const existsInDb = important.dbCandidates.some(c => tableCols.has(c));
-      const wasMapped = important.dbCandidates.some(c => mappedTargets.has(c));
-      return existsInCsv ? !wasMapped : !existsInDb;
-    })
-    .map((important) => {
-      const existsInCsv = important.csvCandidates.some(c => csvBases.has(c));
-      return {
-        jiraColumn: important.jiraColumn,
-        reason: existsInCsv ? 'no-matching-db-column' : 'not-present-in-csv-or-db',
-        expectedDbColumns: important.dbCandidates,
-      };
-    });
+  return IMPORTANT_COLUMNS.flatMap((important) => {
+    const existsInCsv = important.csvCandidates.some(c => csvBases.has(c));
+    const missing = existsInCsv
+      ? !important.dbCandidates.some(c => mappedTargets.has(c))
+      : !important.dbCandidates.some(c => tableCols.has(c));
+    if (!missing) return [];
+    return [{
+      jiraColumn: important.jiraColumn,
+      reason: existsInCsv ? 'no-matching-db-column' : 'not-present-in-csv-or-db',
+      expectedDbColumns: important.dbCandidates,
+    }];
+  });
 }
 
-export async function processJiraCsvSnapshot(text) {
-  const delimiter = sniffDelimiter(text);
-  const headerRow = parseCsv(text, {
-    delimiter,
-    bom: true,
-    from_line: 1,
-    to_line: 1,
-    relax_quotes: true,
-    relax_column_count: true,
-    skip_empty_lines: false,
-  })[0];
+// Las columnas de raw_jira casi nunca cambian: el Map nombre -> cast que se lee
+// de pg_attribute se cachea por instancia caliente para no consultarlo en cada carga.
+const TABLE_COLUMNS_TTL_MS = 5 * 60 * 1000;
+// undefined_column / datatype_mismatch: la caché no refleja el esquema actual
+const STALE_SCHEMA_SQLSTATES = new Set(['42703', '42804']);
 
-  if (!headerRow || !headerRow.length) {
-    const error = new Error('No se pudo leer cabeceras del CSV');
-    error.code = 'CSV_PARSE_ERROR';
-    throw error;
+async function rawJiraColumns() {
+  const cached = global.__rawJiraColumns;
+  if (cached && Date.now() - cached.loadedAt < TABLE_COLUMNS_TTL_MS) {
+    return { columns: cached.columns, fromCache: true };
   }
 
-  const uniqueHeaders = makeUniqueHeaders(headerRow);
-  const columnsForParser = uniqueHeaders.map(x => x.uniqueKey);
-  const duplicated = duplicatedColumns(uniqueHeaders);
+  // Nombre -> cast para la carga posicional (null = sin cast). Las columnas de texto
+  // (text, varchar(n), char(n)) reciben el texto tal cual y la coerción del INSERT
+  // valida el largo ("value too long"); un cast explícito truncaría en silencio.
+  // El resto se castea al nombre interno calificado (pg_catalog.int4, pg_catalog."bit",
+  // ...), que nunca arrastra un typmod por defecto como `character` -> char(1).
+  const { rows: cols } = await withClient(client => client.query(`
+    SELECT
+      a.attname AS column_name,
+      CASE WHEN t.typcategory = 'S' THEN NULL
+           ELSE format('%I.%I', n.nspname, t.typname)
+      END AS column_cast
+    FROM pg_attribute a
+    JOIN pg_type t ON t.oid = a.atttypid
+    JOIN pg_namespace n ON n.oid = t.typnamespace
+    WHERE a.attrelid = to_regclass('public.raw_jira') AND a.attnum > 0 AND NOT a.attisdropped
+  `));
+  const columns = new Map(cols.map(r => [r.column_name, r.column_cast]));
+  if (columns.size) global.__rawJiraColumns = { columns, loadedAt: Date.now() };
+  return { columns, fromCache: false };
+}
 
-  const rows = parseCsv(text, {
-    delimiter,
-    bom: true,
-    columns: columnsForParser,
-    from_line: 2,
-    skip_empty_lines: true,
-    relax_quotes: true,
-    relax_column_count: true,
-    cast: (value) => toDb(value),
-  });
-  if (!rows.length) {
-    const error = new Error('CSV vacío');
-    error.code = 'CSV_PARSE_ERROR';
+// Mapea cabeceras contra las columnas dadas, parsea las filas y recarga el snapshot
+async function loadSnapshot(input, csv, tableCols) {
+  const { delimiter, headerRow, uniqueHeaders, headerIndex, duplicated } = csv;
+
+  if (tableCols.size === 0) {
+    const error = new Error('La tabla public.raw_jira no existe o no tiene columnas.');
+    error.code = 'MISSING_TABLE';
     throw error;
   }
 
-  return withClient(async (client) => {
-    const { rows: cols } = await client.query(`
-      SELECT column_name
-      FROM information_schema.columns
-      WHERE table_schema = 'public' AND table_name = 'raw_jira'
-    `);
-    const tableCols = new Set(cols.map(r => r.column_name));
-    if (tableCols.size === 0) {
-      const error = new Error('La tabla public.raw_jira no existe o no tiene columnas.');
-      error.code = 'MISSING_TABLE';
-      throw error;
-    }
-
-    const hasUploadedAt = tableCols.has('uploaded_at');
-    const mapping = [];
-    const usedTargets = new Set();
-    const ignored = [];
-
-    for (const h of uniqueHeaders) {
-      const { uniqueKey, base, original, occ } = h;
-      let target = null;
-      const candidates = (base === 'sprint')
-        ? candidateDbNamesForSprint(occ)
-        : [
-            ...(HARDCODED[base] ? [HARDCODED[base]] : []),
-            ...candidateDbNamesGeneric(base, occ),
-          ];
-
-      for (const c of candidates) {
-        if (tableCols.has(c) && !usedTargets.has(c)) {
-          target = c;
-          break;
-        }
-      }
+  const hasUploadedAt = tableCols.has('uploaded_at');
+  const mapping = [];
+  const usedTargets = new Set();
+  const ignored = [];
 
-      if (target) {
-        mapping.push({ uniqueKey, original, base, occ, targetDbCol: target });
-        usedTargets.add(target);
-      } else {
-        ignored.push({ uniqueKey, original, base, occ, reason: 'no-matching-db-column' });
+  for (const h of uniqueHeaders) {
+    const { uniqueKey, base, original, occ } = h;
+    let target = null;
+    const candidates = (base === 'sprint')
+      ? candidateDbNamesForSprint(occ)
+      : [
+          ...(HARDCODED[base] ? [HARDCODED[base]] : []),
+          ...candidateDbNamesGeneric(base, occ),
+        ];
+
+    for (const c of candidates) {
+      if (tableCols.has(c) && !usedTargets.has(c)) {
+        target = c;
+        break;
       }
     }
 
-    const insertCols = mapping
-      .map(m => m.targetDbCol)
-      .filter(c => c !== 'id' && c !== 'uploaded_at');
-    const reservedMappings = mapping.filter(m => m.targetDbCol === 'id' || m.targetDbCol === 'uploaded_at');
-    for (const m of reservedMappings) {
-      ignored.push({
-        uniqueKey: m.uniqueKey,
-        original: m.original,
-        base: m.base,
-        occ: m.occ,
-        targetDbCol: m.targetDbCol,
-        reason: 'reserved-db-column',
-      });
+    if (target) {
+      mapping.push({ uniqueKey, original, base, occ, targetDbCol: target });
+      usedTargets.add(target);
+    } else {
+      ignored.push({ uniqueKey, original, base, occ, reason: 'no-matching-db-column' });
     }
+  }
 
-    if (!insertCols.length) {
-      const error = new Error('No hay columnas mapeadas CSV->DB para insertar.');
-      error.code = 'MISSING_COLUMNS';
-      throw error;
-    }
+  const insertCols = mapping
+    .map(m => m.targetDbCol)
+    .filter(c => c !== 'id' && c !== 'uploaded_at');
+  const reservedMappings = mapping.filter(m => m.targetDbCol === 'id' || m.targetDbCol === 'uploaded_at');
+  for (const m of reservedMappings) {
+    ignored.push({
+      uniqueKey: m.uniqueKey,
+      original: m.original,
+      base: m.base,
+      occ: m.occ,
+      targetDbCol: m.targetDbCol,
+      reason: 'reserved-db-column',
+    });
+  }
+
+  if (!insertCols.length) {
+    // El usuario corregirá el esquema y reintentará: no servir columnas viejas desde caché
+    global.__rawJiraColumns = null;
+    const error = new Error('No hay columnas mapeadas CSV->DB para insertar.');
+    error.code = 'MISSING_COLUMNS';
+    throw error;
+  }
+
+  const insertColSet = new Set(insertCols);
+  const insertMapping = mapping.filter(m => insertColSet.has(m.targetDbCol));
+  const mappedByTarget = new Map(insertMapping.map(m => [m.targetDbCol, m]));
+  const missingImportant = missingImportantColumns(uniqueHeaders, tableCols, mapping);
 
-    const insertMapping = mapping.filter(m => insertCols.includes(m.targetDbCol));
-    const mappedByTarget = new Map(insertMapping.map(m => [m.targetDbCol, m]));
-    const missingImportant = missingImportantColumns(uniqueHeaders, tableCols, mapping);
+  // Resolver posición de origen y tipo de cada columna una sola vez, no por fila
+  const sourceIdx = insertCols.map((col) => {
+    const m = mappedByTarget.get(col);
+    if (!m) throw new Error(`Mapping inconsistente para columna ${col}`);
+    return headerIndex.get(m.uniqueKey);
+  });
+  const isTimestamp = insertCols.map(col => TIMESTAMP_COLUMNS.has(col));
 
-    const values = rows.map((row) => {
+  // Parseo y armado de filas en una sola pasada: on_record convierte cada
+  // registro directamente en la fila a insertar, en el orden de insertCols.
+  const values = parseCsv(input, {
+    delimiter,
+    bom: true,
+    from_line: 2,
+    skip_empty_lines: true,
+    relax_quotes: true,
+    relax_column_count: true,
+    on_record: (record) => {
       const arr = new Array(insertCols.length);
       for (let i = 0; i < insertCols.length; i++) {
-        const col = insertCols[i];
-        const m = mappedByTarget.get(col);
-        if (!m) throw new Error(`Mapping inconsistente para columna ${col}`);
-        const raw = toDb(row[m.uniqueKey]);
-        arr[i] = TIMESTAMP_COLUMNS.has(col) ? normalizeJiraDate(raw) : raw;
+        const raw = toDb(record[sourceIdx[i]]);
+        arr[i] = isTimestamp[i] ? normalizeJiraDate(raw) : raw;
       }
       return arr;
-    });
+    },
+  });
+  if (!values.length) {
+    const error = new Error('CSV vacío');
+    error.code = 'CSV_PARSE_ERROR';
+    throw error;
+  }
 
-    await client.query('BEGIN');
+  return withClient(async (client) => {
     try {
-      await client.query('TRUNCATE TABLE public.raw_jira RESTART IDENTITY');
-
+      // Sin parámetros pg usa el protocolo simple: todo viaja en un solo round-trip.
+      // synchronous_commit OFF (solo esta transacción) evita esperar el flush del WAL
+      // en el COMMIT: si el servidor cae justo después se pierde la carga, pero es un
+      // snapshot TRUNCATE + recarga y basta con volver a subir el CSV.
+      await client.query(`
+        BEGIN;
+        SET LOCAL synchronous_commit = OFF;
+        TRUNCATE TABLE public.raw_jira RESTART IDENTITY
+      `);
+
+      // Carga masiva: cada lote viaja como un único parámetro JSON de arreglos
+      // posicionales (sin repetir nombres de columna por fila) y Postgres lo
+      // expande con jsonb_array_elements (cada fila se parsea una vez y r->>i es
+      // acceso directo), casteando solo las columnas que no son de texto.
       const effectiveInsertCols = hasUploadedAt ? [...insertCols, 'uploaded_at'] : [...insertCols];
-      const baseLen = insertCols.length;
-      const extraCols = hasUploadedAt ? 1 : 0;
-      const PG_MAX_PARAMS = 60000;
-      const maxRowsByParams = Math.max(1, Math.floor(PG_MAX_PARAMS / (baseLen + extraCols)));
-      const batchSize = Math.min(500, maxRowsByParams);
+      const selectCols = insertCols
+        .map((col, i) => {
+          const cast = tableCols.get(col);
+          return cast ? `(r->>${i})::${cast}` : `r->>${i}`;
+        })
+        .join(',');
+      const sql = `INSERT INTO public.raw_jira(${effectiveInsertCols.map(quoteIdent).join(',')})
+        SELECT ${selectCols}${hasUploadedAt ? ', NOW()' : ''}
+        FROM jsonb_array_elements($1::jsonb) AS t(r)`;
 
       let total = 0;
-      for (let i = 0; i < values.length; i += batchSize) {
-        const chunk = values.slice(i, i + batchSize);
-        const placeholders = [];
-        let pIndex = 1;
-        for (let r = 0; r < chunk.length; r++) {
-          const ids = [];
-          for (let c = 0; c < baseLen; c++) {
-            ids.push(`$${pIndex++}`);
-          }
-          const tuple = hasUploadedAt ? `(${ids.join(',')}, NOW())` : `(${ids.join(',')})`;
-          placeholders.push(tuple);
-        }
-
-        const expected = chunk.length * baseLen;
-        const flatParams = new Array(expected);
-        let k = 0;
-        for (let r = 0; r < chunk.length; r++) {
-          const rowArr = chunk[r];
-          for (let c = 0; c < baseLen; c++) {
-            flatParams[k++] = rowArr[c];
-          }
+      for (let i = 0; i < values.length; i += BULK_BATCH_ROWS) {
+        const chunk = values.slice(i, i + BULK_BATCH_ROWS);
+        const { rowCount } = await client.query(sql, [JSON.stringify(chunk)]);
+        if (rowCount !== chunk.length) {
+          throw new Error(`Carga incompleta: ${rowCount} de ${chunk.length} filas insertadas`);
         }
-        if (flatParams.length !== expected) {
-          throw new Error(`Param packing mismatch: got ${flatParams.length} vs expected ${expected}`);
-        }
-
-        const sql = `INSERT INTO public.raw_jira(${effectiveInsertCols.map(quoteIdent).join(',')}) VALUES ${placeholders.join(',')}`;
-        await client.query(sql, flatParams);
-        total += chunk.length;
+        total += rowCount;
       }
 
       await client.query('COMMIT');
@@ -432,7 +481,7 @@ export async function processJiraCsvSnapshot(text) {
         message: 'CSV cargado correctamente',
         table: 'public.raw_jira',
         mode: 'snapshot_truncate_reload',
-        totalRowsReceived: rows.length,
+        totalRowsReceived: values.length,
         totalRowsInserted: total,
         totalColumnsReceived: headerRow.length,
         totalColumnsInserted: insertCols.length,
@@ -449,8 +498,53 @@ export async function processJiraCsvSnapshot(text) {
       };
     } catch (e) {
       await client.query('ROLLBACK');
+      // El esquema pudo cambiar: forzar relectura de columnas en la próxima carga
+      global.__rawJiraColumns = null;
       e.code = e.code || 'DB_INSERT_ERROR';
       throw e;
     }
   });
 }
+
+// `input` puede ser string o Buffer: csv-parse consume bytes directamente, así
+// un Buffer descargado nunca se decodifica completo a un string de JS.
+export async function processJiraCsvSnapshot(input) {
+  const delimiter = sniffDelimiter(input);
+  const headerRow = parseCsv(input, {
+    delimiter,
+    bom: true,
+    from_line: 1,
+    to_line: 1,
+    relax_quotes: true,
+    relax_column_count: true,
+    skip_empty_lines: false,
+  })[0];
+
+  if (!headerRow || !headerRow.length) {
+    const error = new Error('No se pudo leer cabeceras del CSV');
+    error.code = 'CSV_PARSE_ERROR';
+    throw error;
+  }
+
+  const uniqueHeaders = makeUniqueHeaders(headerRow);
+  const csv = {
+    delimiter,
+    headerRow,
+    uniqueHeaders,
+    headerIndex: new Map(uniqueHeaders.map((h, i) => [h.uniqueKey, i])),
+    duplicated: duplicatedColumns(uniqueHeaders),
+  };
+
+  // Solo la lectura de metadatos (si no está en caché) usa una conexión; el parseo
+  // CPU-bound del CSV corre sin retener un cliente del pool.
+  const { columns, fromCache } = await rawJiraColumns();
+  try {
+    return await loadSnapshot(input, csv, columns);
+  } catch (e) {
+    // Columnas en caché tras un cambio de esquema (columna inexistente o tipo
+    // distinto): releer el esquema y reintentar la carga una sola vez.
+    if (!fromCache || !STALE_SCHEMA_SQLSTATES.has(e.code)) throw e;
+    const fresh = await rawJiraColumns();
+    return loadSnapshot(input, csv, fresh.columns);
+  }
+}
@@ -1,23 +1,13 @@
 // api/health.js
-import { Client } from 'pg';
+import { withClient } from './_db.js';
 
 export default async function handler(req, res) {
   try {
-    // Armamos la conexión desde variables de entorno típicas de Postgres
-    const con = {
-      host: process.env.PGHOST,
-      port: process.env.PGPORT ? Number(process.env.PGPORT) : 5432,
-      database: process.env.PGDATABASE,
-      user: process.env.PGUSER,
-      password: process.env.PGPASSWORD,
-      ssl: process.env.PGSSLMODE ? { rejectUnauthorized: false } : false,
-    };
-
-    const client = new Client(con);
+    // Reutiliza el pool compartido para no pagar un handshake TLS por request.
+    // La conexión usa la config de _db.js (DATABASE_URL o PG*, siempre con SSL);
+    // PGSSLMODE ya no se consulta aquí.
     const start = Date.now();
-    await client.connect();
-    const dbInfo = await client.query('select version()');
-    await client.end();
+    const dbInfo = await withClient((client) => client.query('select version()'));
 
     res.status(200).json({
       ok: true,
@@ -58,8 +58,8 @@ export default async function handler(req, res) {
       });
     }
 
-    const text = await blobRes.text();
-    const result = await processJiraCsvSnapshot(text);
+    const body = Buffer.from(await blobRes.arrayBuffer());
+    const result = await processJiraCsvSnapshot(body);
 
     return res.status(200).json({
       ok: true,
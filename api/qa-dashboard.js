@@ -61,27 +61,13 @@ function columnExpr(column) {
 function bugCondition(issueTypeColumn) {
   if (!issueTypeColumn) return 'FALSE';
   const expr = `COALESCE(${quoteIdent(issueTypeColumn)}::text, '')`;
-  return `(
-    ${expr} ILIKE '%bug%'
-    OR ${expr} ILIKE '%defecto%'
-    OR ${expr} ILIKE '%error%'
-    OR ${expr} ILIKE '%incidente%'
-  )`;
+  return `(${expr} ~* 'bug|defecto|error|incidente')`;
 }
 
 function closedCondition(statusColumn) {
   if (!statusColumn) return 'FALSE';
   const expr = `COALESCE(${quoteIdent(statusColumn)}::text, '')`;
-  return `(
-    ${expr} ILIKE '%cerrado%'
-    OR ${expr} ILIKE '%cerrada%'
-    OR ${expr} ILIKE '%closed%'
-    OR ${expr} ILIKE '%done%'
-    OR ${expr} ILIKE '%resuelto%'
-    OR ${expr} ILIKE '%resolved%'
-    OR ${expr} ILIKE '%finalizado%'
-    OR ${expr} ILIKE '%finalizada%'
-  )`;
+  return `(${expr} ~* 'cerrad[oa]|closed|done|resuelto|resolved|finalizad[oa]')`;
 }
 
 function dateExpr(column) {